@@ -0,0 +1,165 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from image_ops import decode_rgb, pil_from_array
+from pipeline import load_steps, run_steps
+
+# Headless batch processing with the same filters/affine/flip steps as the tools page.
+# Example:
+#   python batch.py "scans/**/*.jpg" -o out --pipeline '[{"op": "filter", "kernel": "gaussian_5"}]'
+# Huge inputs: --memmap keeps pixels in memory-mapped scratch files instead of RAM.
+# .npy inputs (H x W x 3 uint8) are always memory-mapped, and --format npy writes
+# outputs without going through an image encoder.
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp", ".npy"}
+# Rows copied per step when moving a decoded image into a memory-mapped buffer
+MEMMAP_COPY_ROWS = 1024
+
+def _glob_root(pattern):
+    # Leading directories of a glob pattern that contain no wildcards
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return Path(*parts) if parts else Path(".")
+
+def collect_inputs(patterns):
+    # Returns sorted (source path, path relative to its input root) pairs
+    found = {}
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            root, files = p, (f for f in p.rglob("*") if f.is_file())
+        elif glob.has_magic(pattern):
+            root, files = _glob_root(pattern), (Path(f) for f in glob.glob(pattern, recursive=True))
+        else:
+            root, files = p.parent, [p]
+        for f in files:
+            if f.suffix.lower() in IMAGE_EXTS and f.is_file():
+                found.setdefault(f, f.relative_to(root) if f.is_relative_to(root) else Path(f.name))
+    return sorted(found.items())
+
+def output_path(rel, out_dir, fmt=None):
+    dst = Path(out_dir) / rel
+    return dst.with_suffix(f".{fmt}") if fmt else dst
+
+def memmap_allocator(scratch_dir):
+    # alloc(shape) -> uint8 buffer backed by a file in scratch_dir
+    def alloc(shape):
+        fd, path = tempfile.mkstemp(suffix=".dat", dir=scratch_dir)
+        os.close(fd)
+        return np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+    return alloc
+
+def load_input(src, alloc=None):
+    # .npy files are mapped, never read into RAM. With alloc, other images are
+    # decoded by Pillow and copied into the buffer in row strips, so only Pillow's
+    # own decoded copy is ever held in memory.
+    if Path(src).suffix.lower() == ".npy":
+        return np.load(src, mmap_mode="r")
+    if alloc is None:
+        return decode_rgb(src)
+    with Image.open(src) as img:
+        img = img if img.mode == "RGB" else img.convert("RGB")
+        w, h = img.size
+        arr = alloc((h, w, 3))
+        for y0 in range(0, h, MEMMAP_COPY_ROWS):
+            y1 = min(y0 + MEMMAP_COPY_ROWS, h)
+            arr[y0:y1] = np.asarray(img.crop((0, y0, w, y1)))
+    return arr
+
+def save_output(out, dst):
+    if Path(dst).suffix.lower() == ".npy":
+        # np.save writes memory-mapped and strided arrays in chunks
+        np.save(dst, out)
+    else:
+        pil_from_array(out).save(dst)
+
+def process_file(src, dst, steps, workers=1, memmap=False, scratch_dir=None):
+    # Runs in a worker process; returns (src, seconds, error message or None)
+    start = time.perf_counter()
+    try:
+        Path(dst).parent.mkdir(parents=True, exist_ok=True)
+        if memmap:
+            # trusted local inputs; Pillow would refuse anything above ~180 MP
+            Image.MAX_IMAGE_PIXELS = None
+            with tempfile.TemporaryDirectory(dir=scratch_dir) as tmp:
+                alloc = memmap_allocator(tmp)
+                save_output(run_steps(load_input(src, alloc), steps, workers, alloc=alloc), dst)
+        else:
+            save_output(run_steps(load_input(src), steps, workers), dst)
+    except Exception as e:
+        return str(src), time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return str(src), time.perf_counter() - start, None
+
+def run_batch(inputs, out_dir, steps, processes=None, fmt=None, skip_existing=False, log=print, memmap=False,
+              scratch_dir=None):
+    # Streams jobs through a process pool, keeping a bounded number in flight.
+    # Returns (processed, failed) counts.
+    processes = processes or os.cpu_count() or 1
+    jobs = ((src, output_path(rel, out_dir, fmt)) for src, rel in inputs)
+    if skip_existing:
+        jobs = ((src, dst) for src, dst in jobs if not dst.exists())
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+
+        def drain(limit):
+            nonlocal done, failed
+            while len(pending) > limit:
+                src, seconds, error = pending.popleft().result()
+                if error:
+                    failed += 1
+                    log(f"FAIL {src}: {error}")
+                else:
+                    done += 1
+                    log(f"ok   {src} ({seconds:.2f}s)")
+
+        for src, dst in jobs:
+            pending.append(pool.submit(process_file, src, dst, steps, 1, memmap, scratch_dir))
+            drain(processes * 4)
+        drain(0)
+    return done, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an image-processing pipeline to many images.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--out-dir", required=True, help="output directory")
+    parser.add_argument("-p", "--pipeline", required=True, help="pipeline JSON, or a path to a JSON file")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--format", default=None, help="output format extension, e.g. png (default: keep)")
+    parser.add_argument("--skip-existing", action="store_true", help="skip inputs whose output already exists")
+    parser.add_argument("--memmap", action="store_true",
+                        help="keep images in memory-mapped scratch files (for inputs larger than RAM); "
+                             "also lifts Pillow's decompression-bomb pixel limit")
+    parser.add_argument("--scratch-dir", default=None, help="directory for --memmap files (default: system temp)")
+    args = parser.parse_args(argv)
+
+    spec = args.pipeline
+    if os.path.isfile(spec):
+        spec = Path(spec).read_text()
+    try:
+        steps = load_steps(spec)
+    except ValueError as e:
+        parser.error(f"invalid pipeline: {e}")
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        parser.error("no input images found")
+    start = time.perf_counter()
+    done, failed = run_batch(inputs, args.out_dir, steps, args.processes, args.format, args.skip_existing,
+                             memmap=args.memmap, scratch_dir=args.scratch_dir)
+    print(f"{done} processed, {failed} failed in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
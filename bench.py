@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import PIL
+
+from demo import generate_grid_image_pil
+from image_ops import (
+    CONV_METHODS, apply_convolution_array, array_from_pil, flip_array, pil_from_array, plan_convolution,
+    rotate_array, scale_array, shear_array, translate_array,
+)
+
+# Benchmarks for the image-processing hot paths.
+#   python bench.py --quick                       # small matrix, prints a table
+#   python bench.py -o results.json               # full matrix, machine-readable results
+#   python bench.py -o new.json --compare old.json
+# Peak memory is traced with tracemalloc, which sees NumPy buffers but not
+# Pillow's internal image memory. The "startup" op times a cold start of the
+# app entry point (fresh interpreter, Streamlit bare mode, default Home page).
+# The "exact" op is a pass/fail check: every convolution method must match a
+# float64 reference, bit for bit on the integer path and within EXACT_TOL levels
+# on the float ones; a failing case makes the run exit with status 1.
+# The "buffers" op is a pass/fail check: traced allocations of the array <-> PIL
+# conversions must stay within BUFFER_BOUNDS (multiples of the image's bytes,
+# plus BUFFER_SLACK), and the run exits with status 1 when one does not.
+DEFAULT_SIZES = (256, 1024, 2048, 4096, 7680)
+QUICK_SIZES = (256, 1024)
+DEFAULT_KERNEL_SIZES = (3, 5, 9, 15, 31)
+QUICK_KERNEL_SIZES = (3, 9)
+KERNEL_KINDS = ("separable", "dense", "integer")
+OPS = ("conv", "affine", "flip", "grid", "startup", "exact", "buffers")
+STARTUP_SCRIPT = "home.py"
+# Modules the Home page should not load; reported when a cold start pulls them in
+HEAVY_MODULES = ("scipy", "image_ops", "image_cache", "pipeline", "photos")
+# Kernels for the "exact" check, including ones whose 255 * sum|k| overflows int32
+EXACT_KERNELS = {
+    "sharpen": [[0, -1, 0], [-1, 5, -1], [0, -1, 0]],
+    "gaussian_5": np.outer([1, 4, 6, 4, 1], [1, 4, 6, 4, 1]),
+    "sobel_x": [[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]],
+    "even_2x4": np.ones((2, 4)),
+    "dense_7": np.random.default_rng(1).integers(-3, 4, (7, 7)),
+    "wide_1e7": np.full((2, 2), 1e7),
+    "tap_3e9": [[3e9, 0], [0, 1]],
+}
+EXACT_TOL = 1
+# Raw, a 3e9:1 tap range is past float32 precision (FFT, separability test), so
+# this kernel is only checked normalized, the way the Custom kernel box uses it
+EXACT_NORMALIZED_ONLY = ("tap_3e9",)
+# pil_from_array: no NumPy copy of uint8 input (Pillow's own RGB copy is untraced);
+# array_from_pil: tobytes() chunks plus their join
+BUFFER_BOUNDS = {"pil_from_array": 0, "array_from_pil": 2}
+BUFFER_SLACK = 256 * 1024
+BUFFER_SIZE = 2048
+
+def image_hw(size):
+    # 16:9 for the 8K case, square otherwise
+    return (size * 9 // 16 if size >= 7680 else size), size
+
+def make_image(size, channels, seed=0):
+    h, w = image_hw(size)
+    shape = (h, w) if channels == 1 else (h, w, channels)
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+def make_kernel(kind, n, seed=0):
+    rng = np.random.default_rng(seed)
+    if kind == "separable":
+        return np.ones((n, n), dtype=np.float32)
+    if kind == "integer":
+        return rng.integers(-2, 3, (n, n)).astype(np.float32)
+    return rng.standard_normal((n, n)).astype(np.float32)
+
+def cases(sizes, channels, kernel_sizes, kinds, ops):
+    # Yields (params dict, setup() -> input, fn(input))
+    for size in sizes:
+        if "grid" in ops:
+            yield {"op": "generate_grid_image_pil", "size": size}, lambda: None, lambda _, s=size: generate_grid_image_pil(s)
+        for c in channels:
+            base = {"size": size, "channels": c}
+            setup = lambda s=size, c=c: make_image(s, c)
+            if "conv" in ops:
+                for kind in kinds:
+                    for n in kernel_sizes:
+                        k = make_kernel(kind, n)
+                        yield (dict(base, op="apply_convolution_array", kernel=f"{kind}_{n}"), setup,
+                               lambda a, k=k: apply_convolution_array(a, k))
+            if "affine" in ops:
+                yield dict(base, op="rotate_array"), setup, lambda a: rotate_array(a, 30)
+                yield dict(base, op="scale_array"), setup, lambda a: scale_array(a, 0.8)
+                yield dict(base, op="shear_array"), setup, lambda a: shear_array(a, 0.2, 0.1)
+                yield dict(base, op="translate_array"), setup, lambda a: translate_array(a, 17, -9)
+            if "flip" in ops:
+                # flips are views; time the copy a consumer (encoder, next step) pays for
+                for mode in ("Horizontal", "Vertical", "Both"):
+                    yield dict(base, op="flip_array", mode=mode), setup, lambda a, m=mode: np.ascontiguousarray(flip_array(a, m))
+
+def measure(setup, fn, repeat, warmup=1):
+    arr = setup()
+    for _ in range(warmup):
+        fn(arr)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arr)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(arr)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return times, peak
+
+def measure_startup(repeat, script=STARTUP_SCRIPT):
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = ("import sys, time, runpy\n"
+            "start = time.perf_counter()\n"
+            f"runpy.run_path({script!r}, run_name='__main__')\n"
+            f"print(time.perf_counter() - start, *(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n")
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        seconds, *loaded = out.stdout.splitlines()[-1].split()
+        times.append(float(seconds))
+    t = np.array(times)
+    return {"op": "startup", "script": script, "repeat": repeat, "mean_s": float(t.mean()),
+            "p50_s": float(np.percentile(t, 50)), "p90_s": float(np.percentile(t, 90)),
+            "heavy_modules": loaded}
+
+def reference_convolution(arr, k, normalize):
+    # float64 edge-padded correlation, truncated to uint8 like the engine
+    k = np.asarray(k, dtype=np.float64)
+    kh, kw = k.shape
+    pads = ((kh // 2, kh // 2), (kw // 2, kw // 2)) + ((0, 0),) * (arr.ndim - 2)
+    padded = np.pad(arr.astype(np.float64), pads, mode="edge")
+    oh, ow = padded.shape[0] - kh + 1, padded.shape[1] - kw + 1
+    out = np.zeros((oh, ow) + arr.shape[2:])
+    for i in range(kh):
+        for j in range(kw):
+            out += k[i, j] * padded[i:i + oh, j:j + ow]
+    if normalize and abs(k.sum()) > 1e-6:
+        out /= k.sum()
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+def check_exact(size=96, channels=3):
+    arr = make_image(size, channels)
+    rows = []
+    for name, k in EXACT_KERNELS.items():
+        k = np.asarray(k, dtype=np.float32)
+        for normalize in (True,) if name in EXACT_NORMALIZED_ONLY else (True, False):
+            ref = reference_convolution(arr, k, normalize)
+            for method in CONV_METHODS:
+                out = apply_convolution_array(arr, k, normalize, method)
+                diff = int(np.abs(out.astype(np.int16) - ref).max())
+                # kernels too wide for fixed point fall back to float even when asked for "integer"
+                used = plan_convolution(k, normalize, method, arr.shape, arr.dtype)[0]
+                tol = 0 if used == "integer" else EXACT_TOL
+                rows.append({"op": "exact", "kernel": name, "normalize": normalize, "method": method,
+                             "max_diff": diff, "tol": tol, "ok": diff <= tol})
+    return rows
+
+def check_buffers(size=BUFFER_SIZE):
+    rows = []
+    for channels in (1, 3, 4):
+        arr = make_image(size, channels)
+        img = pil_from_array(arr)
+        for name, fn, src in (("pil_from_array", pil_from_array, arr), ("array_from_pil", array_from_pil, img)):
+            fn(src)
+            tracemalloc.start()
+            fn(src)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            bound = BUFFER_BOUNDS[name] * arr.nbytes + BUFFER_SLACK
+            rows.append({"op": "buffers", "fn": name, "size": size, "channels": channels,
+                         "peak_mb": peak / 1e6, "bound_mb": bound / 1e6, "ok": peak <= bound})
+    return rows
+
+def summarize(params, times, peak, pixels):
+    t = np.array(times)
+    return dict(params,
+                pixels=pixels,
+                repeat=len(times),
+                mean_s=float(t.mean()),
+                p50_s=float(np.percentile(t, 50)),
+                p90_s=float(np.percentile(t, 90)),
+                p99_s=float(np.percentile(t, 99)),
+                mpix_per_s=float(pixels / 1e6 / np.median(t)),
+                peak_mb=peak / 1e6)
+
+def case_id(r):
+    return (r["op"], r.get("size"), r.get("channels"), r.get("kernel"), r.get("mode"))
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pillow": PIL.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "image_workers": os.environ.get("IMAGE_WORKERS"), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def format_row(r, base=None):
+    if r["op"] == "startup":
+        line = f"{'startup ' + r['script']:<48} {r['p50_s'] * 1e3:9.2f} ms  heavy imports: {' '.join(r['heavy_modules']) or 'none'}"
+        if base is not None:
+            line += f"  x{base['p50_s'] / r['p50_s']:.2f} vs baseline"
+        return line
+    if r["op"] == "exact":
+        label = f"exact {r['kernel']} {r['method']}{'' if r['normalize'] else ' raw'}"
+        return f"{label:<48} max diff {r['max_diff']:3d}  tol {r['tol']}  {'ok' if r['ok'] else 'FAIL'}"
+    if r["op"] == "buffers":
+        label = f"buffers {r['fn']} {r['size']} {r['channels']}"
+        return f"{label:<48} {r['peak_mb']:9.2f} MB peak  bound {r['bound_mb']:.2f} MB  {'ok' if r['ok'] else 'FAIL'}"
+    label = " ".join(str(v) for v in case_id(r) if v is not None)
+    line = f"{label:<48} {r['p50_s'] * 1e3:9.2f} ms  {r['mpix_per_s']:8.1f} MP/s  {r['peak_mb']:8.1f} MB"
+    if base is not None:
+        line += f"  x{base['p50_s'] / r['p50_s']:.2f} vs baseline"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the image-processing hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", help="image widths in px")
+    parser.add_argument("--channels", type=int, nargs="+", default=[3], choices=[1, 3, 4])
+    parser.add_argument("--kernel-sizes", type=int, nargs="+")
+    parser.add_argument("--kinds", nargs="+", default=list(KERNEL_KINDS), choices=KERNEL_KINDS)
+    parser.add_argument("--ops", nargs="+", default=list(OPS), choices=OPS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="small sizes and kernels only")
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    kernel_sizes = args.kernel_sizes or (QUICK_KERNEL_SIZES if args.quick else DEFAULT_KERNEL_SIZES)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case_id(r): r for r in json.load(f)["results"]}
+
+    results = []
+    if "startup" in args.ops:
+        r = measure_startup(args.repeat)
+        results.append(r)
+        print(format_row(r, baseline.get(case_id(r))), flush=True)
+    for params, setup, fn in cases(sizes, args.channels, kernel_sizes, args.kinds, args.ops):
+        times, peak = measure(setup, fn, args.repeat)
+        size = params["size"]
+        h, w = (size, size) if params["op"] == "generate_grid_image_pil" else image_hw(size)
+        r = summarize(params, times, peak, h * w)
+        results.append(r)
+        print(format_row(r, baseline.get(case_id(r))), flush=True)
+
+    if "exact" in args.ops:
+        for r in check_exact():
+            results.append(r)
+            print(format_row(r), flush=True)
+
+    if "buffers" in args.ops:
+        for r in check_buffers():
+            results.append(r)
+            print(format_row(r), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+    return 0 if all(r.get("ok", True) for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
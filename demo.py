@@ -0,0 +1,56 @@
+import io
+import threading
+
+from PIL import Image, ImageDraw, ImageFilter
+
+# Demo images for the Home and tools pages. PIL only, so rendering the Home
+# page does not import NumPy or the processing engine.
+
+def generate_grid_image_pil(size=512, grid_steps=8, dark=False):
+    bg = (10, 18, 30) if dark else (255, 255, 255)
+    line = (30, 40, 60) if dark else (200, 200, 200)
+    arrow = (0, 255, 225) if dark else (0, 0, 200)
+    center_dot = (0, 150, 0)
+    img = Image.new("RGB", (size, size), bg)
+    draw = ImageDraw.Draw(img)
+    step = max(4, size // grid_steps)
+    for i in range(0, size, step):
+        draw.line([(i, 0), (i, size)], fill=line, width=1)
+        draw.line([(0, i), (size, i)], fill=line, width=1)
+    draw.line([(size//4, size//4), (3*size//4, size//4)], fill=arrow, width=6)
+    arrow_head = [(3*size//4, size//4), (3*size//4 - 20, size//4 - 15), (3*size//4 - 20, size//4 + 15)]
+    draw.polygon(arrow_head, fill=(138, 43, 226))
+    r = 6
+    cx, cy = size//2, size//2
+    draw.ellipse([(cx-r, cy-r), (cx+r, cy+r)], fill=center_dot)
+    return img
+
+def pil_rotate(img, angle, bg=(255,255,255)):
+    return img.rotate(angle, resample=Image.BICUBIC, expand=False, fillcolor=bg)
+
+def pil_edge_approx(img):
+    gray = img.convert("L")
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    return edges.convert("RGB")
+
+# --- Pre-encoded assets ---
+# The demos are deterministic, so each is rendered and PNG-encoded once per process
+_PNG = {}
+_PNG_LOCK = threading.Lock()
+
+def cached_png(name, build):
+    # build() -> PIL image; returns its PNG bytes
+    with _PNG_LOCK:
+        data = _PNG.get(name)
+        if data is None:
+            buf = io.BytesIO()
+            build().save(buf, format="PNG")
+            data = _PNG[name] = buf.getvalue()
+    return data
+
+def home_examples(size=512):
+    # PNG bytes of the grid, the grid rotated 30 degrees and its edges
+    grid = lambda: generate_grid_image_pil(size, dark=True)
+    return (cached_png(("grid", size), grid),
+            cached_png(("rotated", size), lambda: pil_rotate(grid(), 30, bg=(10,18,30))),
+            cached_png(("edges", size), lambda: pil_edge_approx(grid())))
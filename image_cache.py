@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from image_ops import (
+    DISPLAY_FORMAT, DISPLAY_QUALITY, DISPLAY_WIDTH, apply_convolution_array, affine_array, array_from_pil,
+    array_to_png_bytes, decode_rgb, encode_for_display, pil_from_array,
+)
+
+# Process-wide LRU cache of transform results, shared by all Streamlit sessions.
+# Budget in MB can be set with IMAGE_CACHE_MB (default 256).
+DEFAULT_CACHE_MB = 256
+
+def array_digest(arr):
+    # Content hash of an image array (shape and dtype included)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{arr.shape}|{arr.dtype}".encode())
+    h.update(np.ascontiguousarray(arr).data)
+    return h.hexdigest()
+
+class ResultCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        # value is an array, a tuple of arrays (upload pyramids) or encoded bytes
+        if isinstance(value, bytes):
+            arrays = ()
+            size = len(value) if nbytes is None else nbytes
+        else:
+            arrays = value if isinstance(value, tuple) else (value,)
+            size = nbytes if nbytes is not None else sum(a.nbytes for a in arrays)
+        if size > self.max_bytes:
+            return value
+        # cached arrays are shared between callers, so make them read-only
+        for a in arrays:
+            a.flags.writeable = False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._items[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.nbytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+RESULT_CACHE = ResultCache(int(os.environ.get("IMAGE_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+# Decoded uploads (full resolution + downscaled working copies), keyed by file hash.
+# Budget in MB can be set with UPLOAD_CACHE_MB (default 256).
+UPLOAD_CACHE = ResultCache(int(os.environ.get("UPLOAD_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+# Previews run on the largest pyramid level whose longest side fits this
+PREVIEW_MAX_SIDE = 1024
+
+# Progressive previews first show a bilinear render of a copy this small
+FAST_PREVIEW_MAX_SIDE = 384
+
+def cached_result(tool, arr, params, compute, digest=None, cache=RESULT_CACHE, peek=False):
+    # peek=True only looks the result up and returns None on a miss
+    key = (digest or array_digest(arr), tool, params)
+    out = cache.get(key)
+    if out is None and not peek:
+        out = compute()
+        # a no-op (e.g. the identity affine) returns the input itself; caching it
+        # would make the caller's array read-only and count its bytes twice
+        if out is not arr:
+            cache.put(key, out)
+    return out
+
+# --- Cached tools ---
+def cached_convolution(arr, kernel, normalize=True, digest=None):
+    k = np.ascontiguousarray(kernel, dtype=np.float32)
+    params = (k.shape, k.tobytes(), bool(normalize))
+    return cached_result("conv", arr, params, lambda: apply_convolution_array(arr, k, normalize), digest)
+
+def cached_affine(arr, scale=1.0, angle=0.0, shear_x=0.0, shear_y=0.0, tx=0, ty=0, digest=None,
+                  resample=Image.BICUBIC, peek=False):
+    params = (float(scale), float(angle), float(shear_x), float(shear_y), float(tx), float(ty))
+    return cached_result("affine", arr, params + (int(resample),),
+                         lambda: affine_array(arr, *params, resample=resample), digest, peek=peek)
+
+def download_png(arr, digest=None):
+    # Full-size PNG for the download button, cached by the result's content hash:
+    # hashing costs milliseconds, re-encoding a 12 MP result seconds on every rerun
+    return cached_result("png", arr, (), lambda: array_to_png_bytes(arr), digest)
+
+# --- Display ---
+def display_bytes(arr, digest=None, width=DISPLAY_WIDTH, fmt=DISPLAY_FORMAT, quality=DISPLAY_QUALITY):
+    # Encoded preview for st.image. With a digest (e.g. the original of an upload)
+    # the bytes are cached, so an unchanged image is not re-encoded on every rerun.
+    encode = lambda: encode_for_display(arr, width, fmt, quality)
+    if digest is None:
+        return encode()
+    return cached_result("display", arr, (width, fmt, quality), encode, digest)
+
+# --- Demo assets ---
+# Demo images are deterministic, so each is built once per process and kept with
+# its digest and encoded bytes; pages only pay for sending them.
+_DEMO_ASSETS = {}
+_DEMO_LOCK = threading.Lock()
+
+def demo_asset(name, build, fmt="PNG"):
+    # build() -> uint8 array. Returns (read-only array, digest, display bytes).
+    with _DEMO_LOCK:
+        asset = _DEMO_ASSETS.get(name)
+        if asset is None:
+            arr = build()
+            arr.flags.writeable = False
+            asset = _DEMO_ASSETS[name] = (arr, array_digest(arr), encode_for_display(arr, fmt=fmt))
+    return asset
+
+# --- Decode-once uploads ---
+def build_pyramid(arr, max_side=PREVIEW_MAX_SIDE):
+    # Full-resolution array followed by 2x box-reduced copies, down to <= max_side
+    levels = [arr]
+    pil = pil_from_array(arr)
+    while max(pil.size) > max_side:
+        pil = pil.reduce(2)
+        levels.append(array_from_pil(pil))
+    return tuple(levels)
+
+def load_upload(uploaded, cache=UPLOAD_CACHE):
+    # Returns (file digest, pyramid); the JPEG/PNG is decoded once per distinct file
+    data = uploaded.getvalue()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    levels = cache.get(digest)
+    if levels is None:
+        arr = decode_rgb(io.BytesIO(data))
+        levels = cache.put(digest, build_pyramid(arr))
+    return digest, levels
+
+def working_image(levels, digest, full_res=False, max_side=PREVIEW_MAX_SIDE):
+    # Picks the level to process: the full image for export, else the preview proxy.
+    # Returns (array, cache digest for that level, ratio to full resolution).
+    level = 0
+    if not full_res:
+        while level < len(levels) - 1 and max(levels[level].shape[:2]) > max_side:
+            level += 1
+    arr = levels[level]
+    return arr, f"{digest}:{level}", arr.shape[1] / levels[0].shape[1]
+
+def preview_proxy(arr, digest, max_side=FAST_PREVIEW_MAX_SIDE):
+    # Small copy for the fast first pass of a progressive preview.
+    # Returns (array, cache digest, ratio to arr).
+    h, w = arr.shape[:2]
+    if max(h, w) <= max_side:
+        return arr, digest, 1.0
+    def compute():
+        pil = pil_from_array(arr)
+        pil.thumbnail((max_side, max_side), Image.BILINEAR)
+        return array_from_pil(pil)
+    proxy = cached_result("proxy", arr, (max_side,), compute, digest)
+    return proxy, f"{digest}:proxy{max_side}", proxy.shape[1] / w
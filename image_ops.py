@@ -0,0 +1,705 @@
+import io
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Shared image-processing helpers used by home.py and pages/image_tools.py
+
+# --- Parallel execution ---
+# NumPy ufuncs and Pillow's resamplers release the GIL, so row bands of one
+# image run concurrently on a thread pool. Worker count: IMAGE_WORKERS env var.
+DEFAULT_WORKERS = int(os.environ.get("IMAGE_WORKERS", os.cpu_count() or 1))
+# Images smaller than this run on the calling thread
+PARALLEL_MIN_PIXELS = 1_000_000
+MIN_BAND_ROWS = 32
+
+def resolve_workers(workers, shape):
+    workers = DEFAULT_WORKERS if workers is None else max(1, int(workers))
+    if shape[0] * shape[1] < PARALLEL_MIN_PIXELS:
+        return 1
+    return workers
+
+def band_rows(n_rows, workers, max_rows=None):
+    # Band height giving each worker about two bands
+    rows = max(MIN_BAND_ROWS, -(-n_rows // (2 * workers)))
+    return min(rows, max_rows) if max_rows else rows
+
+def run_bands(fn, n_rows, rows, workers):
+    # Calls fn(y0, y1) for every band of `rows` rows, in parallel when workers > 1
+    bands = [(y0, min(y0 + rows, n_rows)) for y0 in range(0, n_rows, rows)]
+    if workers <= 1 or len(bands) == 1:
+        for y0, y1 in bands:
+            fn(y0, y1)
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(bands))) as pool:
+        # list() re-raises the first exception from a band
+        list(pool.map(lambda b: fn(*b), bands))
+
+# --- Buffers ---
+# Conversions between arrays and PIL images make no NumPy-side copies: uint8
+# arrays go to Image.fromarray as-is (no clip/astype). Pillow shares the buffer
+# for L and RGBA but copies RGB into its own 4-bytes-per-pixel storage.
+# np.asarray(img) reads the pixels through tobytes(), which joins encoded chunks,
+# so it peaks at about twice the image size and keeps one read-only array.
+# `python bench.py --ops buffers` checks these bounds with tracemalloc.
+def pil_from_array(arr):
+    if arr.dtype != np.uint8:
+        arr = np.clip(arr, 0, 255).astype(np.uint8)
+    return Image.fromarray(arr)
+
+def array_from_pil(img):
+    return np.asarray(img)
+
+def decode_rgb(fp):
+    # convert() would copy an image that is already RGB
+    img = Image.open(fp)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return array_from_pil(img)
+
+# --- Convolution ---
+# Relative tolerance for treating the 2nd singular value as zero (rank-1 kernel)
+SEPARABLE_TOL = 1e-5
+
+# Cost model, in ns per output sample (measured on a 1920x1080 RGB image):
+# direct ~ overhead + per-tap * kh*kw, separable ~ overhead + per-tap * (kh+kw),
+# fft ~ per-log2 * log2(padded area), independent of kernel size
+DIRECT_COST = (2.0, 0.9)
+SEPARABLE_COST = (4.0, 0.85)
+FFT_COST = 1.2
+# FFT results are not exact; values this close to an integer are snapped to it
+# so integer kernels truncate the same way as the direct path
+FFT_SNAP_TOL = 2e-3
+CONV_METHODS = ("auto", "direct", "separable", "fft", "integer")
+# Output rows processed per band by the direct and separable paths
+BAND_ROWS = 64
+# Tiled mode: strip height, and the image size (pixels) above which it is used by default
+TILE_ROWS = 256
+TILE_AUTO_PIXELS = 16_000_000
+
+def kernel_scale(k, normalize=True):
+    # Factor applied to the raw kernel when normalizing (sum -> 1)
+    if normalize:
+        s = k.sum()
+        if abs(s) > 1e-6:
+            return 1.0 / s
+    return 1.0
+
+def separable_factors(k, tol=SEPARABLE_TOL):
+    # Returns (col, row) with k == outer(col, row), or None when k is not rank-1.
+    # The SVD only decides the rank; the factors are taken from the pivot column/row
+    # so integer kernels (sobel, binomial gaussian) keep exact integer taps.
+    kh, kw = k.shape
+    if kh > 1 and kw > 1:
+        s = np.linalg.svd(k.astype(np.float64), compute_uv=False)
+        if s[0] <= 1e-12 or s[1] > tol * s[0]:
+            return None
+    i0, j0 = np.unravel_index(np.argmax(np.abs(k)), k.shape)
+    pivot = float(k[i0, j0])
+    if pivot == 0.0:
+        return None
+    col = k[:, j0].astype(np.float64)
+    div = pivot
+    if np.all(k == np.round(k)):
+        g = float(np.gcd.reduce(np.abs(col).astype(np.int64)))
+        col = col / g
+        div = pivot / g
+    row = k[i0, :].astype(np.float64) / div
+    return col.astype(np.float32), row.astype(np.float32)
+
+def _pad_edge(arr, pad_h, pad_w):
+    pads = ((pad_h, pad_h), (pad_w, pad_w)) + ((0, 0),) * (arr.ndim - 2)
+    return np.pad(arr, pads, mode='edge')
+
+def _edge_strip(arr, r0, r1, pad_w):
+    # Rows r0..r1-1 of the edge-padded image (clamped at the borders), columns padded
+    rows = np.clip(np.arange(r0, r1), 0, arr.shape[0] - 1)
+    return _pad_edge(arr[rows], 0, pad_w)
+
+def _out_shape(padded, kh, kw):
+    return (padded.shape[0] - kh + 1, padded.shape[1] - kw + 1) + padded.shape[2:]
+
+def _correlate_direct(padded, k, dtype=np.float32):
+    # Channel-last shifted multiply-adds over one padded (H+2p, W+2p[, C]) array,
+    # processed in row bands so the only full-size buffer is the output
+    kh, kw = k.shape
+    out = np.zeros(_out_shape(padded, kh, kw), dtype=dtype)
+    oh, ow = out.shape[:2]
+    taps = [(i, j, out.dtype.type(k[i, j])) for i in range(kh) for j in range(kw) if k[i, j] != 0]
+    scratch = np.empty((min(BAND_ROWS, oh),) + out.shape[1:], dtype=dtype)
+    for y0 in range(0, oh, BAND_ROWS):
+        y1 = min(y0 + BAND_ROWS, oh)
+        band = out[y0:y1]
+        s = scratch[:y1 - y0]
+        for i, j, v in taps:
+            np.multiply(padded[y0 + i:y1 + i, j:j + ow], v, out=s)
+            band += s
+    return out
+
+def _correlate_separable(padded, col, row, dtype=np.float32):
+    # Two 1D passes (rows, then columns) as shifted multiply-adds: O(kh + kw) per pixel
+    kh, kw = len(col), len(row)
+    col, row = col.astype(dtype), row.astype(dtype)
+    out = np.empty(_out_shape(padded, kh, kw), dtype=dtype)
+    oh, ow = out.shape[:2]
+    rows = min(BAND_ROWS, oh) + kh - 1
+    tmp = np.empty((rows,) + out.shape[1:], dtype=dtype)
+    scratch = np.empty_like(tmp)
+    for y0 in range(0, oh, BAND_ROWS):
+        y1 = min(y0 + BAND_ROWS, oh)
+        n = y1 - y0 + kh - 1
+        src = padded[y0:y0 + n]
+        t = tmp[:n]
+        s = scratch[:n]
+        np.multiply(src[:, 0:ow], row[0], out=t)
+        for j in range(1, kw):
+            np.multiply(src[:, j:j + ow], row[j], out=s)
+            t += s
+        band = out[y0:y1]
+        np.multiply(t[0:y1 - y0], col[0], out=band)
+        for i in range(1, kh):
+            np.multiply(t[i:i + y1 - y0], col[i], out=s[:y1 - y0])
+            band += s[:y1 - y0]
+    return out
+
+def _correlate_fft(padded, kernel, normalize):
+    from scipy import fft as sp_fft
+    # Product of spectra with the kernel's (flipped) spectrum taken from its cache.
+    # Circular wrap-around only reaches the first kh-1 rows / kw-1 columns, which
+    # are not part of the valid output.
+    kh, kw = kernel.shape
+    h, w = padded.shape[:2]
+    size = (sp_fft.next_fast_len(h, real=True), sp_fft.next_fast_len(w, real=True))
+    spec = kernel.spectrum(size, normalize)
+    if padded.ndim == 3:
+        spec = spec[:, :, None]
+    f = sp_fft.rfft2(padded.astype(np.float32), s=size, axes=(0, 1))
+    f *= spec
+    out = sp_fft.irfft2(f, s=size, axes=(0, 1))[kh - 1:h, kw - 1:w]
+    snapped = np.rint(out)
+    np.copyto(out, snapped, where=np.abs(out - snapped) < FFT_SNAP_TOL)
+    return out
+
+def choose_conv_method(shape, kshape, separable):
+    kh, kw = kshape
+    h, w = shape[:2]
+    costs = {"direct": DIRECT_COST[0] + DIRECT_COST[1] * kh * kw}
+    if separable:
+        costs["separable"] = SEPARABLE_COST[0] + SEPARABLE_COST[1] * (kh + kw)
+    if kh * kw > 1:
+        costs["fft"] = FFT_COST * np.log2((h + kh) * (w + kw))
+    return min(costs, key=costs.get)
+
+def _is_integral(a):
+    return bool(np.all(a == np.round(a)))
+
+def _fits_fixed_point(k):
+    # 255 * sum|k| must fit the widest accumulator (int32); larger kernels stay on float
+    return 255 * float(np.abs(np.round(k.astype(np.float64))).sum()) <= np.iinfo(np.int32).max
+
+def _integer_plan(k, normalize, factors):
+    # Fixed-point form of an integer kernel for uint8 input: integer taps, an
+    # int16/int32 accumulator wide enough for 255 * sum|k|, and the normalizing
+    # divisor (a right shift when it is a power of two)
+    ki = np.round(k).astype(np.int64)
+    s = int(ki.sum())
+    divisor = s if normalize and s != 0 else 1
+    bound = 255 * int(np.abs(ki).sum())
+    dtype = np.int16 if bound <= np.iinfo(np.int16).max else np.int32
+    if factors is not None and _is_integral(factors[0]) and _is_integral(factors[1]):
+        taps = (np.round(factors[0]), np.round(factors[1]))
+    else:
+        taps = ki
+    shift = divisor.bit_length() - 1 if divisor > 1 and divisor & (divisor - 1) == 0 else None
+    return taps, dtype, divisor, shift
+
+def plan_convolution(kernel, normalize=True, method="auto", shape=None, dtype=np.uint8):
+    # Resolves the backend and the prepared kernel form it runs with:
+    # (method, taps | (col, row) | integer plan | (kernel, normalize) for fft).
+    # Only the method choice depends on the call; the forms are built once per kernel.
+    if method not in CONV_METHODS:
+        raise ValueError(f"Unknown convolution method: {method}")
+    kernel = prepare_kernel(kernel)
+    integral = np.dtype(dtype) == np.uint8 and kernel.integral
+    if method == "integer" and not integral:
+        method = "auto"
+    if method == "auto":
+        method = choose_conv_method(shape, kernel.shape, kernel.factors is not None)
+        # integer kernels on uint8 images accumulate in fixed point instead of float
+        if integral and method != "fft":
+            method = "integer"
+    elif method == "separable" and kernel.factors is None:
+        method = "direct"
+    if method == "integer":
+        return method, kernel.fixed_point(normalize)
+    if method == "separable":
+        return method, kernel.separable(normalize)
+    if method == "fft":
+        return method, (kernel, normalize)
+    return method, kernel.normalized(normalize)
+
+def _run_plan(padded, plan):
+    method, payload = plan
+    if method == "integer":
+        taps, dtype, divisor, shift = payload
+        if isinstance(taps, tuple):
+            acc = _correlate_separable(padded, *taps, dtype=dtype)
+        else:
+            acc = _correlate_direct(padded, taps, dtype=dtype)
+        # floor division; it matches float truncation wherever the result survives clipping
+        if shift is not None:
+            np.right_shift(acc, shift, out=acc)
+        elif divisor != 1:
+            np.floor_divide(acc, divisor, out=acc)
+        return acc
+    if method == "separable":
+        return _correlate_separable(padded, *payload)
+    if method == "fft":
+        return _correlate_fft(padded, *payload)
+    return _correlate_direct(padded, payload)
+
+def _store_uint8(res, out):
+    np.clip(res, 0, 255, out=res)
+    out[...] = res
+
+def conv_output_shape(shape, kshape):
+    # Same as the input for odd kernels; even kernels gain a row/column, since
+    # they are padded by k // 2 on both sides (e.g. 10x10 with 2x2 -> 11x11)
+    kh, kw = kshape
+    return (shape[0] + 2 * (kh // 2) - kh + 1, shape[1] + 2 * (kw // 2) - kw + 1) + tuple(shape[2:])
+
+def apply_convolution_array(arr, kernel, normalize=True, method="auto", tile_rows=None, out=None,
+                            workers=None):
+    # tile_rows processes the output in strips of that many rows (with kernel halos),
+    # writing each straight into the uint8 `out`, so peak memory is O(strip).
+    # Images above TILE_AUTO_PIXELS are tiled automatically; tile_rows=0 disables it.
+    # With several workers the strips run on a thread pool.
+    kernel = prepare_kernel(kernel)
+    kh, kw = kernel.shape
+    pad_h, pad_w = kh // 2, kw // 2
+    H, W = arr.shape[:2]
+    out_shape = conv_output_shape(arr.shape, (kh, kw))
+    if out is None:
+        out = np.empty(out_shape, dtype=np.uint8)
+    workers = resolve_workers(workers, arr.shape)
+    if tile_rows is None and (workers > 1 or H * W > TILE_AUTO_PIXELS):
+        tile_rows = band_rows(out_shape[0], workers, TILE_ROWS)
+    if not tile_rows or tile_rows >= out_shape[0]:
+        plan = plan_convolution(kernel, normalize, method, arr.shape, arr.dtype)
+        _store_uint8(_run_plan(_pad_edge(arr, pad_h, pad_w), plan), out)
+        return out
+    plan = plan_convolution(kernel, normalize, method, (tile_rows + kh - 1, W + 2 * pad_w), arr.dtype)
+
+    def strip(y0, y1):
+        padded = _edge_strip(arr, y0 - pad_h, y1 - pad_h + kh - 1, pad_w)
+        _store_uint8(_run_plan(padded, plan), out[y0:y1])
+
+    run_bands(strip, out_shape[0], tile_rows, workers)
+    return out
+
+# --- Kernels ---
+# Every kernel the engine sees is prepared once per process: its taps are
+# checked for separability and the normalized, separable, fixed-point and FFT
+# forms are built on first use and kept. Named kernels live in KERNELS for the
+# life of the process; any other kernel (custom, fused, parametric) is interned
+# by content in a small LRU, so repeating it costs a dict lookup.
+KERNEL_CACHE_SIZE = 256
+# Kernel spectra kept across calls, keyed by kernel and FFT size (one per image
+# or strip size in use)
+FFT_SPECTRA_CACHE = 16
+
+class PreparedKernel:
+    def __init__(self, taps, name=None):
+        taps = np.array(taps, dtype=np.float32)
+        if taps.ndim != 2 or taps.size == 0:
+            raise ValueError(f"Kernel must be a non-empty 2D array, got shape {taps.shape}")
+        taps.flags.writeable = False
+        self.taps = taps
+        self.name = name
+        self.shape = taps.shape
+        self.key = (taps.shape, taps.tobytes())
+        self.factors = separable_factors(taps) if taps.size > 1 else None
+        # integer taps that the fixed-point path can accumulate without overflow
+        self.integral = _is_integral(taps) and _fits_fixed_point(taps)
+        self._forms = {}
+
+    def _form(self, key, build):
+        form = self._forms.get(key)
+        if form is None:
+            form = self._forms[key] = build()
+        return form
+
+    def normalized(self, normalize=True):
+        # Taps scaled to sum 1 (the raw taps when normalize is off or the sum is ~0)
+        def build():
+            if kernel_scale(self.taps, normalize) == 1.0:
+                return self.taps
+            k = self.taps / self.taps.sum()
+            k.flags.writeable = False
+            return k
+        return self._form(("normalized", bool(normalize)), build)
+
+    def separable(self, normalize=True):
+        # (col, row) factors with the normalization folded into the column pass
+        col, row = self.factors
+        scale = kernel_scale(self.taps, normalize)
+        return self._form(("separable", bool(normalize)), lambda: ((col * scale).astype(np.float32), row))
+
+    def fixed_point(self, normalize=True):
+        return self._form(("integer", bool(normalize)), lambda: _integer_plan(self.taps, normalize, self.factors))
+
+    def spectrum(self, size, normalize=True):
+        # rfft2 of the flipped normalized taps zero-padded to `size` (complex64)
+        key = (self.key, bool(normalize), size)
+        with _SPECTRA_LOCK:
+            spec = _SPECTRA.get(key)
+            if spec is not None:
+                _SPECTRA.move_to_end(key)
+                return spec
+        from scipy import fft as sp_fft
+        spec = sp_fft.rfft2(self.normalized(normalize)[::-1, ::-1], s=size)
+        spec.flags.writeable = False
+        with _SPECTRA_LOCK:
+            _SPECTRA[key] = spec
+            while len(_SPECTRA) > FFT_SPECTRA_CACHE:
+                _SPECTRA.popitem(last=False)
+        return spec
+
+_SPECTRA = OrderedDict()
+_SPECTRA_LOCK = threading.Lock()
+
+KERNELS = {name: PreparedKernel(taps, name) for name, taps in {
+    "blur_3": np.ones((3,3)),
+    "gaussian_5": [[1,4,6,4,1],
+                   [4,16,24,16,4],
+                   [6,24,36,24,6],
+                   [4,16,24,16,4],
+                   [1,4,6,4,1]],
+    "sharpen": [[0,-1,0],[-1,5,-1],[0,-1,0]],
+    "sobel_x": [[-1,0,1],[-2,0,2],[-1,0,1]],
+    "sobel_y": [[-1,-2,-1],[0,0,0],[1,2,1]],
+    "laplacian": [[0,1,0],[1,-4,1],[0,1,0]],
+}.items()}
+
+_NAMED = {k.key: k for k in KERNELS.values()}
+_PREPARED = OrderedDict()
+_PREPARED_LOCK = threading.Lock()
+
+def prepare_kernel(kernel):
+    # PreparedKernel for an array (or an already prepared kernel), interned by content
+    if isinstance(kernel, PreparedKernel):
+        return kernel
+    taps = np.ascontiguousarray(kernel, dtype=np.float32)
+    key = (taps.shape, taps.tobytes())
+    prepared = _NAMED.get(key)
+    if prepared is not None:
+        return prepared
+    with _PREPARED_LOCK:
+        prepared = _PREPARED.get(key)
+        if prepared is not None:
+            _PREPARED.move_to_end(key)
+            return prepared
+    prepared = PreparedKernel(taps)
+    with _PREPARED_LOCK:
+        prepared = _PREPARED.setdefault(key, prepared)
+        while len(_PREPARED) > KERNEL_CACHE_SIZE:
+            _PREPARED.popitem(last=False)
+    return prepared
+
+def predefined_kernels():
+    # Name -> read-only taps; the same arrays on every call
+    return {name: k.taps for name, k in KERNELS.items()}
+
+# --- Kernel families ---
+# Parametric kernels; each returns read-only taps that are already prepared.
+# Radii (and box sizes) are capped so a typo like sigma=1e6 is an error, not a huge kernel.
+FAMILY_MAX_RADIUS = 64
+
+def _check_radius(radius):
+    if not 0 <= radius <= FAMILY_MAX_RADIUS:
+        raise ValueError(f"kernel radius must be in [0, {FAMILY_MAX_RADIUS}], got {radius}")
+    return radius
+
+def _gaussian_1d(sigma, radius=None):
+    if sigma <= 0:
+        raise ValueError(f"sigma must be positive, got {sigma}")
+    radius = _check_radius(int(math.ceil(3 * sigma)) if radius is None else int(radius))
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    g = np.exp(-x * x / (2 * sigma * sigma))
+    return g / g.sum()
+
+def gaussian_kernel(sigma=1.0, radius=None):
+    # Sampled Gaussian, radius ceil(3 sigma) by default; rank-1 and summing to 1
+    g = _gaussian_1d(sigma, radius)
+    return prepare_kernel(np.outer(g, g)).taps
+
+def box_kernel(size=3):
+    if not 1 <= size <= 2 * FAMILY_MAX_RADIUS + 1:
+        raise ValueError(f"box size must be in [1, {2 * FAMILY_MAX_RADIUS + 1}], got {size}")
+    size = int(size)
+    return prepare_kernel(np.ones((size, size))).taps
+
+def log_kernel(sigma=1.0, radius=None):
+    # Scale-normalized Laplacian of Gaussian (sigma^2 * LoG), shifted to sum 0 so
+    # flat regions give 0; negative centre, like "laplacian"
+    if sigma <= 0:
+        raise ValueError(f"sigma must be positive, got {sigma}")
+    radius = _check_radius(int(math.ceil(3 * sigma)) if radius is None else int(radius))
+    g = _gaussian_1d(sigma, radius)
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    r2 = x[:, None] ** 2 + x[None, :] ** 2
+    k = (r2 / (2 * sigma * sigma) - 1) * np.outer(g, g) * 2
+    return prepare_kernel(k - k.mean()).taps
+
+def unsharp_kernel(sigma=1.0, amount=1.0, radius=None):
+    # (1 + amount) * identity - amount * gaussian: sums to 1, so normalizing is a no-op
+    k = -float(amount) * gaussian_kernel(sigma, radius).astype(np.float64)
+    c = k.shape[0] // 2
+    k[c, c] += 1.0 + float(amount)
+    return prepare_kernel(k).taps
+
+KERNEL_FAMILIES = {
+    "gaussian": gaussian_kernel,
+    "box": box_kernel,
+    "log": log_kernel,
+    "unsharp": unsharp_kernel,
+}
+
+def family_kernel(name, **params):
+    # e.g. family_kernel("gaussian", sigma=2.0); unknown names/parameters raise ValueError
+    build = KERNEL_FAMILIES.get(name)
+    if build is None:
+        raise ValueError(f"Unknown kernel family: {name!r}")
+    try:
+        return build(**{k: float(v) for k, v in params.items()})
+    except TypeError:
+        raise ValueError(f"Invalid parameters for {name}: {sorted(params)}") from None
+
+def parse_kernel(text):
+    # Same format as the "Custom kernel" text area: rows separated by ';', values by ','
+    rows = [r.strip() for r in text.split(";") if r.strip() != ""]
+    try:
+        kernel = np.array([[float(x) for x in row.split(",")] for row in rows], dtype=np.float32)
+    except ValueError:
+        raise ValueError(f"Invalid kernel: {text!r}") from None
+    if kernel.ndim != 2 or kernel.size == 0 or not np.all(np.isfinite(kernel)):
+        raise ValueError(f"Invalid kernel: {text!r}")
+    return kernel
+
+# --- Affine transforms ---
+# Matrices are 3x3 inverse maps (output pixel -> input pixel), the convention
+# Image.transform(AFFINE) expects; a chain is composed by right-multiplying.
+FILL_COLOR = (10, 18, 30)
+
+def scale_matrix(w, h, scale):
+    # Resize by `scale`, centered on a (w, h) canvas
+    new_w = max(1, int(w * scale))
+    new_h = max(1, int(h * scale))
+    sx, sy = w / new_w, h / new_h
+    px, py = (w - new_w) // 2, (h - new_h) // 2
+    return np.array([[sx, 0.0, -px * sx], [0.0, sy, -py * sy], [0.0, 0.0, 1.0]])
+
+def rotation_matrix(w, h, angle):
+    # Counter-clockwise rotation about the image center, as Image.rotate
+    a = -math.radians(angle % 360.0)
+    c, s = round(math.cos(a), 15), round(math.sin(a), 15)
+    cx, cy = w / 2, h / 2
+    return np.array([[c, s, cx - c * cx - s * cy], [-s, c, cy + s * cx - c * cy], [0.0, 0.0, 1.0]])
+
+def shear_matrix(shear_x=0.0, shear_y=0.0):
+    return np.array([[1.0, shear_x, 0.0], [shear_y, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+def translation_matrix(tx, ty):
+    return np.array([[1.0, 0.0, tx], [0.0, 1.0, ty], [0.0, 0.0, 1.0]])
+
+def flip_matrix(w, h, mode):
+    fx = mode in ("Horizontal", "Both")
+    fy = mode in ("Vertical", "Both")
+    return np.array([[-1.0 if fx else 1.0, 0.0, w if fx else 0.0],
+                     [0.0, -1.0 if fy else 1.0, h if fy else 0.0],
+                     [0.0, 0.0, 1.0]])
+
+def compose_affine(w, h, scale=1.0, angle=0.0, shear_x=0.0, shear_y=0.0, tx=0, ty=0):
+    # Same order as the tools page: scale -> rotate -> shear -> translate
+    return (scale_matrix(w, h, scale) @ rotation_matrix(w, h, angle)
+            @ shear_matrix(shear_x, shear_y) @ translation_matrix(tx, ty))
+
+def _affine_data(matrix):
+    return tuple(float(v) for v in matrix[:2].ravel())
+
+# --- Affine fast paths ---
+# A composed matrix is classified before warping. Classes that map output pixel
+# centers exactly onto input pixel centers need no interpolation:
+#   identity     the input itself
+#   translation  integer shift: a slice copied into a filled canvas
+#   orthogonal   flips and quarter turns (plus integer shift): a strided view, shifted
+#   scale        axis-aligned scale: one Image.resize of the visible region
+#   general      anything else: Image.transform
+AFFINE_CLASSES = ("identity", "translation", "orthogonal", "scale", "general")
+AFFINE_TOL = 1e-9
+
+def _pixel_offsets(m):
+    # Input pixel index = linear part @ output index + offsets, for pixel centers
+    (a, b, c), (d, e, f) = m[0], m[1]
+    return (a + b) / 2 + c - 0.5, (d + e) / 2 + f - 0.5
+
+def _near_int(v):
+    return abs(v - round(v)) < AFFINE_TOL
+
+def classify_affine(matrix):
+    m = np.asarray(matrix, dtype=np.float64)
+    (a, b, _), (d, e, _) = m[0], m[1]
+    ou, ov = _pixel_offsets(m)
+    on_grid = _near_int(ou) and _near_int(ov)
+    axis_aligned = abs(b) < AFFINE_TOL and abs(d) < AFFINE_TOL
+    unit = lambda v: abs(abs(v) - 1.0) < AFFINE_TOL
+    if axis_aligned and on_grid and abs(a - 1.0) < AFFINE_TOL and abs(e - 1.0) < AFFINE_TOL:
+        return "identity" if round(ou) == 0 and round(ov) == 0 else "translation"
+    if on_grid and ((axis_aligned and unit(a) and unit(e)) or
+                    (abs(a) < AFFINE_TOL and abs(e) < AFFINE_TOL and unit(b) and unit(d))):
+        return "orthogonal"
+    if axis_aligned and a > 0 and e > 0:
+        return "scale"
+    return "general"
+
+def _fill_value(arr, fillcolor):
+    # The pixel value Pillow would fill with, for this array's mode
+    return np.asarray(Image.new(Image.fromarray(arr[:1, :1]).mode, (1, 1), fillcolor))[0, 0]
+
+def _orthogonal_view(arr, m):
+    # Returns (view, row offset, col offset) with out[y, x] == view[y + row, x + col]
+    (a, b, _), (d, e, _) = m[0], m[1]
+    ou, ov = _pixel_offsets(m)
+    if abs(a) < AFFINE_TOL:
+        # input column follows output rows: work on the transposed view
+        src, rs, cs, ro, co = arr.swapaxes(0, 1), b, d, ou, ov
+    else:
+        src, rs, cs, ro, co = arr, e, a, ov, ou
+    if rs < 0:
+        src, ro = src[::-1], src.shape[0] - 1 - ro
+    if cs < 0:
+        src, co = src[:, ::-1], src.shape[1] - 1 - co
+    return src, int(round(ro)), int(round(co))
+
+def _shift_array(src, ro, co, shape, fill):
+    # out[y, x] = src[y + ro, x + co] on an (h, w) canvas, fill where out of range
+    h, w = shape[:2]
+    if ro == 0 and co == 0 and src.shape[:2] == (h, w):
+        return src
+    out = np.empty((h, w) + src.shape[2:], dtype=src.dtype)
+    y0, y1 = max(0, -ro), min(h, src.shape[0] - ro)
+    x0, x1 = max(0, -co), min(w, src.shape[1] - co)
+    if y0 >= y1 or x0 >= x1:
+        out[...] = fill
+        return out
+    out[:y0] = fill
+    out[y1:] = fill
+    out[y0:y1, :x0] = fill
+    out[y0:y1, x1:] = fill
+    out[y0:y1, x0:x1] = src[y0 + ro:y1 + ro, x0 + co:x1 + co]
+    return out
+
+def _scale_resize(arr, m, resample, fill):
+    # Output column x samples input u = a * (x + 0.5) + c, so the visible output
+    # range [x0, x1) is a resize of the input box [a * x0 + c, a * x1 + c)
+    (a, _, c), (_, e, f) = m[0], m[1]
+    h, w = arr.shape[:2]
+    # evaluated like Pillow does, so edge pixels get the same in/out decision
+    u = a * (np.arange(w) + 0.5) + c
+    v = e * (np.arange(h) + 0.5) + f
+    cols = np.flatnonzero((u >= 0) & (u < w))
+    rows = np.flatnonzero((v >= 0) & (v < h))
+    if not len(cols) or not len(rows):
+        return _shift_array(arr, h, w, arr.shape, fill)
+    x0, x1, y0, y1 = cols[0], cols[-1] + 1, rows[0], rows[-1] + 1
+    # the outer pixels' edges may reach half a pixel past the input: clamp
+    box = (max(0.0, a * x0 + c), max(0.0, e * y0 + f), min(w, a * x1 + c), min(h, e * y1 + f))
+    region = array_from_pil(pil_from_array(arr).resize((int(x1 - x0), int(y1 - y0)), resample, box=box))
+    return _shift_array(region, -int(y0), -int(x0), arr.shape, fill)
+
+def apply_affine_array(arr, matrix, resample=Image.BICUBIC, fillcolor=FILL_COLOR, workers=None):
+    kind = classify_affine(matrix)
+    if kind == "identity":
+        return arr
+    if kind != "general":
+        fill = _fill_value(arr, fillcolor)
+        if kind == "scale":
+            return _scale_resize(arr, matrix, resample, fill)
+        return _shift_array(*_orthogonal_view(arr, matrix), arr.shape, fill)
+    pil = pil_from_array(arr)
+    h, w = arr.shape[:2]
+    workers = resolve_workers(workers, arr.shape)
+    if workers <= 1:
+        return array_from_pil(pil.transform((w, h), Image.AFFINE, _affine_data(matrix), resample=resample, fillcolor=fillcolor))
+    # Each band warps its own output rows: shift the band origin into the matrix
+    out = np.empty_like(arr)
+
+    def band(y0, y1):
+        data = _affine_data(matrix @ translation_matrix(0, y0))
+        out[y0:y1] = array_from_pil(pil.transform((w, y1 - y0), Image.AFFINE, data, resample=resample, fillcolor=fillcolor))
+
+    run_bands(band, h, band_rows(h, workers), workers)
+    return out
+
+def affine_array(arr, scale=1.0, angle=0.0, shear_x=0.0, shear_y=0.0, tx=0, ty=0, resample=Image.BICUBIC,
+                 workers=None):
+    h, w = arr.shape[:2]
+    return apply_affine_array(arr, compose_affine(w, h, scale, angle, shear_x, shear_y, tx, ty), resample,
+                              workers=workers)
+
+def scale_array(arr, scale_factor):
+    h, w = arr.shape[:2]
+    return apply_affine_array(arr, scale_matrix(w, h, scale_factor))
+
+def rotate_array(arr, angle):
+    h, w = arr.shape[:2]
+    return apply_affine_array(arr, rotation_matrix(w, h, angle))
+
+def shear_array(arr, shear_x=0.0, shear_y=0.0):
+    return apply_affine_array(arr, shear_matrix(shear_x, shear_y))
+
+def translate_array(arr, tx, ty):
+    return apply_affine_array(arr, translation_matrix(tx, ty))
+
+# --- Flips ---
+FLIP_MODES = ("Horizontal", "Vertical", "Both")
+
+# Flips return strided views of the input: no pixels are
+# touched until the result is read, e.g. when it is encoded for display.
+def flip_array(arr, mode):
+    if mode == "Horizontal":
+        return arr[:, ::-1]
+    elif mode == "Vertical":
+        return arr[::-1]
+    else:
+        return arr[::-1, ::-1]
+
+def array_to_png_bytes(arr):
+    buf = io.BytesIO()
+    pil_from_array(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+# --- Display encoding ---
+# Previews are shown in half-width columns, so they are sent to the browser
+# downscaled to DISPLAY_WIDTH px and lossy-encoded. Override with the
+# DISPLAY_WIDTH / DISPLAY_FORMAT (JPEG, WEBP or PNG) / DISPLAY_QUALITY env vars.
+DISPLAY_WIDTH = int(os.environ.get("DISPLAY_WIDTH", 800))
+DISPLAY_FORMAT = os.environ.get("DISPLAY_FORMAT", "JPEG").upper()
+DISPLAY_QUALITY = int(os.environ.get("DISPLAY_QUALITY", 85))
+
+def encode_for_display(arr, width=DISPLAY_WIDTH, fmt=DISPLAY_FORMAT, quality=DISPLAY_QUALITY):
+    pil = pil_from_array(arr)
+    if width and pil.width > width:
+        height = max(1, round(pil.height * width / pil.width))
+        pil = pil.resize((width, height), Image.BILINEAR, reducing_gap=2.0)
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        pil.save(buf, format="PNG")
+    else:
+        pil.save(buf, format=fmt, quality=quality)
+    return buf.getvalue()
@@ -1,7 +1,9 @@
 import streamlit as st
 from PIL import Image, ImageOps, ImageDraw
 import numpy as np
-from numpy.lib.stride_tricks import sliding_window_view
+from image_ops import flip_array, parse_kernel, predefined_kernels
+from image_cache import RESULT_CACHE, cached_affine, cached_convolution, demo_asset, display_bytes, download_png, load_upload, preview_proxy, working_image
+from pipeline import load_steps, run_steps, scale_translation
 
 # --- Language selection ---
 LANG_OPTIONS = {"English": "en", "Bahasa Indonesia": "id"}
@@ -19,6 +21,9 @@ TEXT = {
         "affine": "Affine Transformations",
         "flip": "Flip",
         "conv": "Convolution / Filters",
+        "pipeline": "Pipeline (multi-step)",
+        "pipeline_steps": "Steps (one per line)",
+        "pipeline_help": "One step per line: `filter <kernel> [normalize=false]` (kernel families: `gaussian sigma=2`, `box size=5`, `log sigma=1.4`, `unsharp sigma=1 amount=1`), `affine angle=30 scale=1.2 tx=0 ty=0 shear_x=0 shear_y=0`, `flip Horizontal|Vertical|Both`. Consecutive filters and consecutive geometric steps run fused as one pass. Fused results can differ from running the steps one at a time: near the image borders, and because geometric steps are not cropped between each other.",
         "rotation": "Rotation (deg)",
         "scale": "Scale",
         "translate_x": "Translate X (px)",
@@ -31,7 +36,10 @@ TEXT = {
         "filter_selection": "Filter selection",
         "custom_kernel_help": "Enter kernel as rows separated by ';' and values by commas. Example: 0,-1,0; -1,5,-1; 0,-1,0",
         "normalize": "Normalize kernel (sum -> 1) if possible",
-        "tip": "Tip: Use medium-size images (<= 1024 px) for best responsiveness."
+        "full_res": "Full resolution (slower)",
+        "progressive": "Progressive preview (fast draft first)",
+        "download": "Download result (PNG)",
+        "tip": "Tip: previews run on a copy of at most 1024 px; tick 'Full resolution' to process and download the original size."
     },
     "id": {
         "page_title": "Alat Pengolahan Citra",
@@ -42,6 +50,9 @@ TEXT = {
         "affine": "Transformasi Affine",
         "flip": "Flip",
         "conv": "Konvolusi / Filter",
+        "pipeline": "Pipeline (multi-langkah)",
+        "pipeline_steps": "Langkah (satu per baris)",
+        "pipeline_help": "Satu langkah per baris: `filter <kernel> [normalize=false]` (keluarga kernel: `gaussian sigma=2`, `box size=5`, `log sigma=1.4`, `unsharp sigma=1 amount=1`), `affine angle=30 scale=1.2 tx=0 ty=0 shear_x=0 shear_y=0`, `flip Horizontal|Vertical|Both`. Filter berurutan dan langkah geometri berurutan dijalankan sekaligus dalam satu proses. Hasil gabungan bisa berbeda dari menjalankan langkah satu per satu: di dekat tepi citra, dan karena langkah geometri tidak dipotong di antara langkah.",
         "rotation": "Rotasi (deg)",
         "scale": "Skala",
         "translate_x": "Translasi X (px)",
@@ -54,7 +65,10 @@ TEXT = {
         "filter_selection": "Pemilihan filter",
         "custom_kernel_help": "Masukkan kernel sebagai baris dipisah ';' dan nilai dipisah koma. Contoh: 0,-1,0; -1,5,-1; 0,-1,0",
         "normalize": "Normalisasi kernel (jumlah -> 1) jika memungkinkan",
-        "tip": "Tip: Gunakan gambar ukuran sedang (<= 1024 px) untuk respons terbaik."
+        "full_res": "Resolusi penuh (lebih lambat)",
+        "progressive": "Pratinjau progresif (draf cepat dulu)",
+        "download": "Unduh hasil (PNG)",
+        "tip": "Tip: pratinjau memakai salinan maksimal 1024 px; centang 'Resolusi penuh' untuk memproses dan mengunduh ukuran asli."
     }
 }
 
@@ -68,16 +82,6 @@ st.markdown(f"<h1 style='color:#00ffe1'>{t['title']}</h1>", unsafe_allow_html=Tr
 st.markdown(f"<div class='neon-box'>{t['lead']}</div>", unsafe_allow_html=True)
 
 # --- helpers (cv2-free) ---
-def load_image_to_array(uploaded_file):
-    if uploaded_file is None:
-        return None
-    pil = Image.open(uploaded_file).convert("RGB")
-    return np.array(pil)
-
-def pil_from_array(arr):
-    arr = np.clip(arr, 0, 255).astype(np.uint8)
-    return Image.fromarray(arr)
-
 def generate_demo_array(size=512):
     img = Image.new("RGB", (size, size), (10, 18, 30))
     draw = ImageDraw.Draw(img)
@@ -88,94 +92,24 @@ def generate_demo_array(size=512):
     draw.text((size//6, size//2 - 30), "DEMO", fill=(0,255,225))
     return np.array(img)
 
-def rotate_array(arr, angle):
-    pil = pil_from_array(arr)
-    return np.array(pil.rotate(angle, resample=Image.BICUBIC, expand=False, fillcolor=(10,18,30)))
-
-def scale_array(arr, scale_factor):
-    h, w = arr.shape[:2]
-    new_w = max(1, int(w * scale_factor))
-    new_h = max(1, int(h * scale_factor))
-    pil = pil_from_array(arr)
-    scaled = pil.resize((new_w, new_h), resample=Image.BICUBIC)
-    canvas = Image.new("RGB", (w, h), (10,18,30))
-    paste_x = max(0, (w - new_w)//2)
-    paste_y = max(0, (h - new_h)//2)
-    canvas.paste(scaled, (paste_x, paste_y))
-    return np.array(canvas)
-
-def translate_array(arr, tx, ty):
-    pil = pil_from_array(arr)
-    w, h = pil.size
-    return np.array(pil.transform((w, h), Image.AFFINE, (1, 0, tx, 0, 1, ty), resample=Image.BICUBIC, fillcolor=(10,18,30)))
-
-def shear_array(arr, shear_x=0.0, shear_y=0.0):
-    pil = pil_from_array(arr)
-    w, h = pil.size
-    a = 1.0
-    b = shear_x
-    c = 0.0
-    d = shear_y
-    e = 1.0
-    f = 0.0
-    return np.array(pil.transform((w, h), Image.AFFINE, (a, b, c, d, e, f), resample=Image.BICUBIC, fillcolor=(10,18,30)))
-
-def flip_array(arr, mode):
-    pil = pil_from_array(arr)
-    if mode == "Horizontal":
-        return np.array(pil.transpose(Image.FLIP_LEFT_RIGHT))
-    elif mode == "Vertical":
-        return np.array(pil.transpose(Image.FLIP_TOP_BOTTOM))
-    else:
-        return np.array(pil.transpose(Image.FLIP_LEFT_RIGHT).transpose(Image.FLIP_TOP_BOTTOM))
-
-def apply_convolution_array(arr, kernel, normalize=True):
-    k = np.array(kernel, dtype=np.float32)
-    kh, kw = k.shape
-    if normalize:
-        s = k.sum()
-        if abs(s) > 1e-6:
-            k = k / s
-    pad_h = kh // 2
-    pad_w = kw // 2
-    if arr.ndim == 2:
-        padded = np.pad(arr, ((pad_h, pad_h), (pad_w, pad_w)), mode='edge')
-        patches = sliding_window_view(padded, (kh, kw))
-        out = np.tensordot(patches, k, axes=([2,3],[0,1]))
-        return np.clip(out, 0, 255).astype(np.uint8)
-    else:
-        H, W, C = arr.shape
-        out = np.zeros_like(arr, dtype=np.float32)
-        for ch in range(C):
-            padded = np.pad(arr[:,:,ch], ((pad_h, pad_h), (pad_w, pad_w)), mode='edge')
-            patches = sliding_window_view(padded, (kh, kw))
-            conv_ch = np.tensordot(patches, k, axes=([2,3],[0,1]))
-            out[:,:,ch] = conv_ch
-        return np.clip(out, 0, 255).astype(np.uint8)
-
-def predefined_kernels():
-    return {
-        "blur_3": np.ones((3,3), dtype=np.float32),
-        "gaussian_5": (np.array([[1,4,6,4,1],
-                                 [4,16,24,16,4],
-                                 [6,24,36,24,6],
-                                 [4,16,24,16,4],
-                                 [1,4,6,4,1]], dtype=np.float32)),
-        "sharpen": np.array([[0,-1,0],[-1,5,-1],[0,-1,0]], dtype=np.float32),
-        "sobel_x": np.array([[-1,0,1],[-2,0,2],[-1,0,1]], dtype=np.float32),
-        "sobel_y": np.array([[-1,-2,-1],[0,0,0],[1,2,1]], dtype=np.float32),
-        "laplacian": np.array([[0,1,0],[1,-4,1],[0,1,0]], dtype=np.float32),
-    }
+DEFAULT_PIPELINE = "filter gaussian_5\nfilter sharpen\naffine angle=15\nflip Horizontal"
 
 # --- UI ---
 uploaded = st.file_uploader(t["upload"], type=["jpg","jpeg","png"])
-if uploaded:
-    img_arr = load_image_to_array(uploaded)
-else:
-    img_arr = generate_demo_array(512)
 
 st.sidebar.header(t["tools"])
-tool = st.sidebar.radio("", [t["affine"], t["flip"], t["conv"]])
+tool = st.sidebar.radio("", [t["affine"], t["flip"], t["conv"], t["pipeline"]])
+full_res = st.sidebar.checkbox(t["full_res"], value=False)
+
+# decode once per file; previews use a downscaled working copy
+if uploaded:
+    upload_digest, levels = load_upload(uploaded)
+    img_arr, img_digest, ratio = working_image(levels, upload_digest, full_res)
+    orig_bytes = display_bytes(img_arr, img_digest)
+else:
+    # the demo's display bytes are encoded once, with the array
+    img_arr, img_digest, orig_bytes = demo_asset("tools_demo", lambda: generate_demo_array(512))
+    ratio = 1.0
 
 if tool == t["affine"]:
     st.sidebar.subheader(t["affine"])
@@ -185,20 +119,27 @@ if tool == t["affine"]:
     ty = st.sidebar.slider(t["translate_y"], -300, 300, 0)
     shear_x = st.sidebar.slider(t["shear_x"], -1.0, 1.0, 0.0, 0.01)
     shear_y = st.sidebar.slider(t["shear_y"], -1.0, 1.0, 0.0, 0.01)
+    progressive = st.sidebar.checkbox(t["progressive"], value=True)
 
-    transformed = img_arr.copy()
-    transformed = scale_array(transformed, scale)
-    transformed = rotate_array(transformed, angle)
-    transformed = shear_array(transformed, shear_x, shear_y)
-    transformed = translate_array(transformed, int(tx), int(ty))
+    tx, ty = int(tx) * ratio, int(ty) * ratio
+    transformed = cached_affine(img_arr, scale, angle, shear_x, shear_y, tx, ty, digest=img_digest, peek=True)
 
     col_o, col_t = st.columns(2)
     with col_o:
         st.subheader(t["original"])
-        st.image(Image.fromarray(img_arr), use_column_width=True)
+        st.image(orig_bytes, use_column_width=True)
     with col_t:
         st.subheader(t["transformed"])
-        st.image(Image.fromarray(transformed), use_column_width=True)
+        slot = st.empty()
+        if transformed is None and progressive:
+            # draft: bilinear on a small proxy. A slider change reruns the script,
+            # so the bicubic pass below only completes once the input settles.
+            proxy, proxy_digest, pr = preview_proxy(img_arr, img_digest)
+            draft = cached_affine(proxy, scale, angle, shear_x, shear_y, tx * pr, ty * pr, digest=proxy_digest, resample=Image.BILINEAR)
+            slot.image(display_bytes(draft), use_column_width=True)
+        if transformed is None:
+            transformed = cached_affine(img_arr, scale, angle, shear_x, shear_y, tx, ty, digest=img_digest)
+        slot.image(display_bytes(transformed), use_column_width=True)
 
 elif tool == t["flip"]:
     st.sidebar.subheader(t["flip"])
@@ -207,10 +148,30 @@ elif tool == t["flip"]:
     col_o, col_t = st.columns(2)
     with col_o:
         st.subheader(t["original"])
-        st.image(Image.fromarray(img_arr), use_column_width=True)
+        st.image(orig_bytes, use_column_width=True)
     with col_t:
         st.subheader(f"{t['transformed']}: {flip_mode}")
-        st.image(Image.fromarray(transformed), use_column_width=True)
+        st.image(display_bytes(transformed), use_column_width=True)
+
+elif tool == t["pipeline"]:
+    st.sidebar.subheader(t["pipeline"])
+    st.sidebar.markdown(t["pipeline_help"])
+    spec = st.sidebar.text_area(t["pipeline_steps"], DEFAULT_PIPELINE)
+    try:
+        steps = scale_translation(load_steps(spec), ratio)
+    except ValueError as e:
+        st.sidebar.error(f"Invalid pipeline: {e}")
+        steps = []
+    # each fused stage is cached, so editing the last step reuses the earlier ones
+    transformed = run_steps(img_arr, steps, digest=img_digest, cache=RESULT_CACHE)
+
+    col_o, col_t = st.columns(2)
+    with col_o:
+        st.subheader(t["original"])
+        st.image(orig_bytes, use_column_width=True)
+    with col_t:
+        st.subheader(f"{t['transformed']}: {len(steps)} steps")
+        st.image(display_bytes(transformed), use_column_width=True)
 
 else:
     st.sidebar.subheader(t["filter_selection"])
@@ -221,24 +182,26 @@ else:
         st.sidebar.markdown(t["custom_kernel_help"])
         custom = st.sidebar.text_area("Custom kernel", "0,-1,0; -1,5,-1; 0,-1,0")
         try:
-            rows = [r.strip() for r in custom.split(";") if r.strip()!=""]
-            kernel = np.array([[float(x) for x in row.split(",")] for row in rows], dtype=np.float32)
-        except Exception:
+            kernel = parse_kernel(custom)
+        except ValueError:
             st.sidebar.error("Invalid kernel format.")
             kernel = kernels["sharpen"]
     else:
         kernel = kernels[sel]
 
     normalize = st.sidebar.checkbox(t["normalize"], value=True)
-    transformed = apply_convolution_array(img_arr, kernel, normalize=normalize)
+    transformed = cached_convolution(img_arr, kernel, normalize=normalize, digest=img_digest)
 
     col_o, col_t = st.columns(2)
     with col_o:
         st.subheader(t["original"])
-        st.image(Image.fromarray(img_arr), use_column_width=True)
+        st.image(orig_bytes, use_column_width=True)
     with col_t:
         st.subheader(f"{t['transformed']}: {sel}")
-        st.image(Image.fromarray(transformed), use_column_width=True)
+        st.image(display_bytes(transformed), use_column_width=True)
+
+if full_res:
+    st.download_button(t["download"], download_png(transformed), file_name="transformed.png", mime="image/png")
 
 st.markdown("---")
 st.caption(t["tip"])
@@ -1,6 +1,5 @@
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont
-from pathlib import Path
+from photos import find_photo_path, generate_avatar, photo_thumbnail
 
 # Set page config early (before any Streamlit UI calls)
 st.set_page_config(page_title="Team Members", layout="wide", initial_sidebar_state="expanded")
@@ -78,40 +77,6 @@ team = [
 
 PHOTO_DIRS = ["images"]
 
-def generate_avatar(name, size=270, bgcolor=(70,130,180)):
-    initials = "".join([part[0].upper() for part in name.split()[:2]])
-    img = Image.new("RGB", (size, size), bgcolor)
-    draw = ImageDraw.Draw(img)
-    try:
-        font = ImageFont.truetype("DejaVuSans-Bold.ttf", size // 3)
-    except Exception:
-        font = ImageFont.load_default()
-    w, h = draw.textsize(initials, font=font)
-    draw.text(((size - w) / 2, (size - h) / 2), initials, fill="white", font=font)
-    return img
-
-def find_photo_path(member, dirs):
-    candidates = []
-    if member.get("photo_file"):
-        candidates.append(member["photo_file"])
-    name_parts = [member["short"]] + member["full_name"].lower().split()
-    for part in name_parts:
-        candidates.append(f"{part}.jpg")
-        candidates.append(f"{part}.jpeg")
-        candidates.append(f"{part}.png")
-    for d in dirs:
-        p = Path(d)
-        if not p.exists() or not p.is_dir():
-            continue
-        for cand in candidates:
-            fpath = p / cand
-            if fpath.exists():
-                return str(fpath)
-        for f in p.iterdir():
-            if f.is_file() and member["short"].lower() in f.name.lower() and f.suffix.lower() in [".jpg", ".jpeg", ".png"]:
-                return str(f)
-    return None
-
 # Display members
 for member in team:
     cols = st.columns([1, 3])
@@ -119,8 +84,7 @@ for member in team:
         photo_path = find_photo_path(member, PHOTO_DIRS)
         if photo_path:
             try:
-                img = Image.open(photo_path).convert("RGB")
-                st.image(img, width=270)
+                st.image(photo_thumbnail(photo_path), width=270)
             except Exception:
                 st.warning(f"File {photo_path} found but cannot be opened. Showing avatar.")
                 st.image(generate_avatar(member["full_name"]), width=270)
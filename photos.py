@@ -0,0 +1,187 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Team photo lookup, thumbnails and avatars shared by home.py and pages/team.py
+PHOTO_EXTS = (".jpg", ".jpeg", ".png")
+
+class PhotoIndex:
+    # Lower-case file stem -> path for one photo directory. Rebuilt only when the
+    # directory's mtime changes (a file added, removed or renamed).
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._mtime = None
+        self._by_stem = {}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        by_stem = {}
+        for entry in os.scandir(self.directory):
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext not in PHOTO_EXTS or not entry.is_file():
+                continue
+            # same stem in several formats: prefer .jpg, then .jpeg, then .png
+            old = by_stem.get(stem.lower())
+            if old is None or PHOTO_EXTS.index(ext) < PHOTO_EXTS.index(os.path.splitext(old)[1].lower()):
+                by_stem[stem.lower()] = entry.path
+        return by_stem
+
+    def entries(self):
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if mtime != self._mtime:
+                self._by_stem = self._scan() if mtime is not None else {}
+                self._mtime = mtime
+            return self._by_stem
+
+    def get(self, stem):
+        return self.entries().get(stem.lower())
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+def photo_index(directory):
+    key = os.path.abspath(directory)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = PhotoIndex(key)
+    return index
+
+def member_stems(member):
+    # Names a member's photo may be saved under, most specific first
+    stems = []
+    if member.get("photo_file"):
+        stems.append(os.path.splitext(member["photo_file"])[0])
+    stems.append(member["short"])
+    stems.extend(member["full_name"].split())
+    return [s.lower() for s in stems]
+
+def find_photo_path(member, dirs):
+    # Stem lookups are dict hits, so "tris.jpg" in the team data also finds tris.jpeg
+    stems = member_stems(member)
+    short = member["short"].lower()
+    for d in dirs:
+        entries = photo_index(d).entries()
+        for stem in stems:
+            if stem in entries:
+                return entries[stem]
+        # last resort: a file whose name merely contains the short name
+        for stem in sorted(entries):
+            if short in stem:
+                return entries[stem]
+    return None
+
+# --- Thumbnails ---
+# Photos are shown THUMB_WIDTH px wide. Thumbnails at 1x and 2x (for HiDPI
+# screens) are written once to THUMB_CACHE_DIR, named by the photo's content
+# hash; the hash itself is only recomputed when a file's mtime or size changes.
+THUMB_WIDTH = 270
+THUMB_SCALES = (1, 2)
+# the 2x thumbnail is the one served; st.image scales it to THUMB_WIDTH
+THUMB_SERVE_SCALE = 2
+THUMB_QUALITY = 85
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "team_thumbs"))
+
+_HASHES = {}
+_THUMBS = {}
+_THUMBS_LOCK = threading.Lock()
+
+def file_digest(path):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _HASHES.get(key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = _HASHES[key] = h.hexdigest()
+    return digest
+
+def render_thumbnail(path, width):
+    with Image.open(path) as img:
+        # JPEG: let the decoder downscale by 1/2..1/8 while keeping width >= target
+        img.draft("RGB", (width, 1))
+        img = img.convert("RGB")
+    if img.width > width:
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=THUMB_QUALITY)
+    return buf.getvalue()
+
+def photo_thumbnail(path, width=THUMB_WIDTH, scale=THUMB_SERVE_SCALE, cache_dir=THUMB_CACHE_DIR):
+    # JPEG bytes of the photo `width * scale` px wide (never upscaled)
+    digest = file_digest(path)
+    key = (digest, width * scale)
+    data = _THUMBS.get(key)
+    if data is not None:
+        return data
+    with _THUMBS_LOCK:
+        cache = Path(cache_dir)
+        cache.mkdir(parents=True, exist_ok=True)
+        for s in sorted(set(THUMB_SCALES) | {scale}):
+            px = width * s
+            target = cache / f"{digest}_{px}.jpg"
+            if not target.exists():
+                tmp = target.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(render_thumbnail(path, px))
+                os.replace(tmp, target)
+        data = (cache / f"{digest}_{width * scale}.jpg").read_bytes()
+        _THUMBS[key] = data
+    return data
+
+# --- Avatars ---
+# Initials avatars for members without a photo. Fonts are loaded once per size
+# and each (initials, size, color) is rendered once per process.
+AVATAR_FONT = "DejaVuSans-Bold.ttf"
+AVATAR_COLOR = (70, 130, 180)
+
+_FONTS = {}
+_AVATARS = {}
+_AVATARS_LOCK = threading.Lock()
+
+def load_font(size, name=AVATAR_FONT):
+    font = _FONTS.get((name, size))
+    if font is None:
+        try:
+            font = ImageFont.truetype(name, size)
+        except OSError:
+            font = ImageFont.load_default()
+        _FONTS[(name, size)] = font
+    return font
+
+def initials(name):
+    return "".join(part[0].upper() for part in name.split()[:2])
+
+def render_avatar(text, size, bgcolor):
+    img = Image.new("RGB", (size, size), bgcolor)
+    draw = ImageDraw.Draw(img)
+    font = load_font(size // 3)
+    # textbbox includes the glyphs' offset from the origin, so center the box itself
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    draw.text(((size - (right - left)) / 2 - left, (size - (bottom - top)) / 2 - top), text, fill="white", font=font)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def generate_avatar(name, size=270, bgcolor=AVATAR_COLOR):
+    # PNG bytes of the initials avatar for `name`
+    key = (initials(name), size, tuple(bgcolor))
+    data = _AVATARS.get(key)
+    if data is None:
+        with _AVATARS_LOCK:
+            data = _AVATARS.get(key)
+            if data is None:
+                data = _AVATARS[key] = render_avatar(key[0], size, key[2])
+    return data
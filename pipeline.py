@@ -0,0 +1,217 @@
+import hashlib
+import json
+import math
+
+import numpy as np
+
+from image_ops import (
+    FLIP_MODES, KERNEL_FAMILIES, apply_affine_array, apply_convolution_array, compose_affine, conv_output_shape,
+    family_kernel, flip_array, flip_matrix, kernel_scale, parse_kernel, predefined_kernels,
+)
+from image_cache import array_digest, cached_result
+
+# Multi-step pipelines, shared by the tools page and the batch CLI.
+# A spec is a JSON list of steps, e.g.
+#   [{"op": "filter", "kernel": "gaussian_5"},
+#    {"op": "affine", "angle": 30, "scale": 1.2},
+#    {"op": "flip", "mode": "Horizontal"}]
+# or the same as text, one step per line:
+#   filter gaussian_5
+#   affine angle=30 scale=1.2
+#   flip Horizontal
+# A filter kernel is a predefined name, a list of rows, or "0,-1,0; -1,5,-1; 0,-1,0",
+# or a kernel family with its parameters as extra keys:
+#   filter gaussian sigma=2        {"op": "filter", "kernel": "gaussian", "sigma": 2}
+#   filter box size=5
+#   filter log sigma=1.4
+#   filter unsharp sigma=1 amount=0.8
+AFFINE_PARAMS = {"scale": 1.0, "angle": 0.0, "shear_x": 0.0, "shear_y": 0.0, "tx": 0.0, "ty": 0.0}
+
+def _resolve_kernel(kernel, params=None):
+    if isinstance(kernel, str) and kernel in KERNEL_FAMILIES:
+        return family_kernel(kernel, **(params or {}))
+    if params:
+        raise ValueError(f"Unknown filter parameters: {sorted(params)}")
+    if isinstance(kernel, str):
+        kernels = predefined_kernels()
+        if kernel in kernels:
+            return kernels[kernel]
+        return parse_kernel(kernel)
+    if not isinstance(kernel, list) or not all(isinstance(row, list) for row in kernel):
+        raise ValueError(f"Kernel must be a name, a string or a list of rows, got {kernel!r}")
+    return parse_kernel(";".join(",".join(str(v) for v in row) for row in kernel))
+
+def _number(value, name):
+    # Finite scalar parameter; anything else (lists, inf, nan, junk text) is a ValueError
+    if isinstance(value, (list, dict)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be finite, got {value!r}")
+    return value
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "off")
+    return bool(value)
+
+def normalize_step(step):
+    # Validates a step dict and fills in defaults
+    if not isinstance(step, dict):
+        raise ValueError(f"Pipeline step must be an object, got {step!r}")
+    op = step.get("op")
+    if op == "filter":
+        if "kernel" not in step:
+            raise ValueError("filter step needs a 'kernel'")
+        params = {k: _number(v, k) for k, v in step.items() if k not in ("op", "kernel", "normalize")}
+        return {"op": op, "kernel": _resolve_kernel(step["kernel"], params),
+                "normalize": _parse_bool(step.get("normalize", True))}
+    if op == "affine":
+        unknown = set(step) - set(AFFINE_PARAMS) - {"op"}
+        if unknown:
+            raise ValueError(f"Unknown affine parameters: {sorted(unknown)}")
+        return dict({"op": op}, **{k: _number(step.get(k, v), k) for k, v in AFFINE_PARAMS.items()})
+    if op == "flip":
+        mode = step.get("mode", "Horizontal")
+        if mode not in FLIP_MODES:
+            raise ValueError(f"Unknown flip mode: {mode}")
+        return {"op": op, "mode": mode}
+    raise ValueError(f"Unknown pipeline op: {op!r}")
+
+def parse_step_line(line):
+    # "filter <kernel> [normalize=false]", "affine key=value ...", "flip <mode>"
+    op, _, rest = line.strip().partition(" ")
+    options = dict(tok.split("=", 1) for tok in rest.split() if "=" in tok)
+    args = " ".join(tok for tok in rest.split() if "=" not in tok)
+    if op == "filter":
+        return dict(options, op=op, kernel=args)
+    if op == "flip":
+        return dict(options, op=op, mode=args or "Horizontal")
+    if args:
+        raise ValueError(f"Unexpected arguments for {op}: {args}")
+    return dict(options, op=op)
+
+def load_steps(spec):
+    # spec: JSON or one-step-per-line text. Never a path: the tools pages pass user
+    # input straight in, so reading spec files is left to the batch CLI.
+    if spec.lstrip().startswith(("[", "{")):
+        steps = json.loads(spec)
+        if isinstance(steps, dict):
+            steps = [steps]
+    else:
+        steps = [parse_step_line(line) for line in spec.splitlines()
+                 if line.strip() and not line.strip().startswith("#")]
+    return [normalize_step(s) for s in steps]
+
+def scale_translation(steps, ratio):
+    # Translations are in full-resolution pixels; rescale them for a preview proxy
+    return [dict(s, tx=s["tx"] * ratio, ty=s["ty"] * ratio) if s["op"] == "affine" else s for s in steps]
+
+# --- Fusion ---
+# Consecutive filters become one kernel and consecutive affine/flip steps one
+# matrix, so each run costs a single convolution or a single resample.
+# Filters are only fused when the first one cannot leave [0, 255] (non-negative
+# taps summing to at most 1), so skipping the intermediate clip is safe. Fusion
+# is still not identical to running the steps one by one:
+# - inside the image, results differ by the uint8 rounding between the passes
+#   (a few levels);
+# - within the fused kernel's radius of the border they can differ a lot, since
+#   the image is edge-padded once for the fused kernel instead of once per pass;
+# - fused warps resample once, so content a step would move out of the frame is
+#   not cropped before the next one (angle=90 then angle=-90 gives back the
+#   original image, not its cropped rotation).
+
+def _odd(k):
+    return k.shape[0] % 2 == 1 and k.shape[1] % 2 == 1
+
+def _range_preserving(k, normalize):
+    taps = k * kernel_scale(k, normalize)
+    return bool(np.all(taps >= 0) and taps.sum() <= 1 + 1e-6)
+
+def fuse_kernels(a, normalize_a, b, normalize_b):
+    # Kernel equivalent to correlating with a, then with b: their full convolution
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    c = np.zeros((a.shape[0] + b.shape[0] - 1, a.shape[1] + b.shape[1] - 1))
+    for i, j in zip(*np.nonzero(a)):
+        c[i:i + b.shape[0], j:j + b.shape[1]] += a[i, j] * b
+    scale = kernel_scale(a, normalize_a) * kernel_scale(b, normalize_b)
+    # keep raw (often integer) taps when plain normalization gives the same scale
+    if np.isclose(scale, kernel_scale(c, True)):
+        return c.astype(np.float32), True
+    if np.isclose(scale, 1.0):
+        return c.astype(np.float32), False
+    return (c * scale).astype(np.float32), False
+
+def fuse_steps(steps, shape):
+    # Returns fused stages: {"op": "filter", "kernel", "normalize"},
+    # {"op": "warp", "matrix"} or {"op": "flip", "mode"}; `steps` counts the inputs
+    h, w = shape[:2]
+    stages = []
+    for step in steps:
+        prev = stages[-1] if stages else None
+        if step["op"] == "filter":
+            k, norm = step["kernel"], step["normalize"]
+            if (prev and prev["op"] == "filter" and _odd(prev["kernel"]) and _odd(k)
+                    and _range_preserving(prev["kernel"], prev["normalize"])):
+                prev["kernel"], prev["normalize"] = fuse_kernels(prev["kernel"], prev["normalize"], k, norm)
+                prev["steps"] += 1
+            else:
+                stages.append({"op": "filter", "kernel": k, "normalize": norm, "steps": 1})
+            kh, kw = k.shape
+            h, w = h + 2 * (kh // 2) - kh + 1, w + 2 * (kw // 2) - kw + 1
+            continue
+        if step["op"] == "flip":
+            m = flip_matrix(w, h, step["mode"])
+        else:
+            m = compose_affine(w, h, *(step[k] for k in AFFINE_PARAMS))
+        if prev and prev["op"] in ("warp", "flip"):
+            # later steps map output -> previous output, so they multiply on the right
+            prev["matrix"] = prev["matrix"] @ m
+            prev["steps"] += 1
+            if step["op"] != "flip":
+                prev["op"] = "warp"
+        else:
+            stages.append({"op": step["op"] if step["op"] == "flip" else "warp", "matrix": m, "steps": 1})
+    for stage in stages:
+        if stage["op"] == "flip":
+            # only flips: exact transpose instead of a resample
+            fx, fy = stage["matrix"][0, 0] < 0, stage["matrix"][1, 1] < 0
+            stage["mode"] = "Both" if fx and fy else "Horizontal" if fx else "Vertical" if fy else None
+    return stages
+
+def _stage_key(stage):
+    if stage["op"] == "filter":
+        k = stage["kernel"]
+        return ("filter", k.shape, k.tobytes(), stage["normalize"])
+    if stage["op"] == "flip":
+        return ("flip", stage["mode"])
+    return ("warp", np.round(stage["matrix"], 9).tobytes())
+
+def run_stage(arr, stage, workers=None, alloc=None):
+    # alloc(shape) -> uint8 buffer for filter outputs (e.g. a memory-mapped file);
+    # warps are resampled by Pillow and always return in-memory arrays
+    if stage["op"] == "filter":
+        out = alloc(conv_output_shape(arr.shape, stage["kernel"].shape)) if alloc else None
+        return apply_convolution_array(arr, stage["kernel"], normalize=stage["normalize"], out=out, workers=workers)
+    if stage["op"] == "flip":
+        return flip_array(arr, stage["mode"]) if stage["mode"] else arr
+    return apply_affine_array(arr, stage["matrix"], workers=workers)
+
+def run_steps(arr, steps, workers=None, digest=None, cache=None, alloc=None):
+    # Runs the fused stages in order. With a cache, each stage result is stored
+    # under a digest chained from the input's, so editing a late step reuses
+    # the earlier stages.
+    if cache is not None and digest is None:
+        digest = array_digest(arr)
+    for stage in fuse_steps(steps, arr.shape):
+        if cache is None:
+            arr = run_stage(arr, stage, workers, alloc)
+            continue
+        key = _stage_key(stage)
+        arr = cached_result("stage", arr, key, lambda a=arr, s=stage: run_stage(a, s, workers), digest, cache)
+        digest = hashlib.blake2b(f"{digest}|{key}".encode(), digest_size=16).hexdigest()
+    return arr
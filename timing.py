@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Per-rerun stage timings for the Streamlit pages.
+# Set TIMING_LOG to a file path to append every rerun's timings there as JSON lines.
+ROLLING_WINDOW = 50
+
+logger = logging.getLogger("image_tools.timing")
+
+class RerunTimer:
+    def __init__(self, page):
+        self.page = page
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        # Time spent in the block is added to `name` (a stage may run several times)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return time.perf_counter() - self._start
+
+class TimingHistory:
+    # Rolling per-stage samples over the last `window` reruns of each page, process-wide
+    def __init__(self, window=ROLLING_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, page, stages):
+        with self._lock:
+            for name, seconds in stages.items():
+                self._samples.setdefault((page, name), deque(maxlen=self.window)).append(seconds)
+
+    def averages(self, page):
+        with self._lock:
+            return {name: sum(s) / len(s) for (p, name), s in self._samples.items() if p == page}
+
+HISTORY = TimingHistory()
+
+def _configure_log():
+    path = os.environ.get("TIMING_LOG")
+    if path and not logger.handlers:
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+_configure_log()
+
+def finish_rerun(timer, history=HISTORY):
+    # Records the rerun (with its total) and returns the stage dict
+    stages = dict(timer.stages, total=timer.total())
+    history.add(timer.page, stages)
+    if logger.handlers:
+        logger.info(json.dumps({"time": time.time(), "page": timer.page,
+                                "ms": {k: round(v * 1e3, 3) for k, v in stages.items()}}))
+    return stages
+
+def timing_rows(page, stages, history=HISTORY):
+    # Table rows for the debug panel: stage, last rerun and rolling average in ms
+    averages = history.averages(page)
+    return [{"stage": name, "last (ms)": round(sec * 1e3, 1), "avg (ms)": round(averages.get(name, sec) * 1e3, 1)}
+            for name, sec in stages.items()]